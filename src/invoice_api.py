@@ -1,21 +1,121 @@
 """FastAPI server for serving invoice UI and API endpoints."""
 
-import json
+import asyncio
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional
 
+import orjson
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
-from .pdf_processor import InvoiceFieldExtractor, process_invoices_in_directory
+from .pdf_processor import (
+    ExtractedInvoice,
+    extract_invoices_cached,
+    get_cached_invoice,
+    list_pdf_entries,
+    process_invoices_in_directory,
+    search_invoices_in_directory,
+)
 
 logger = logging.getLogger(__name__)
 
+# Per-client request budget for /api/ routes: a steady rate plus a burst large
+# enough for the dashboard's initial load
+RATE_LIMIT_PER_SECOND = 5.0
+RATE_LIMIT_BURST = 10
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON response rendered with orjson, which is several times faster."""
+
+    def render(self, content) -> bytes:
+        """Serialize content to JSON bytes."""
+        return orjson.dumps(content)
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying a per-client token bucket to API routes.
+
+    Clients over their budget get an immediate 429 instead of queueing more
+    PDF work behind the requests already in flight. Buckets live in process
+    memory, so with several uvicorn workers each worker enforces the limit
+    separately.
+    """
+
+    # Idle buckets are pruned once this many clients are tracked
+    MAX_CLIENTS = 10_000
+
+    def __init__(
+        self,
+        app,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: int = RATE_LIMIT_BURST,
+        path_prefix: str = "/api/",
+    ):
+        self.app = app
+        self.rate = rate
+        self.burst = burst
+        self.path_prefix = path_prefix
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def _allow(self, client: str) -> bool:
+        """Take one token from the client's bucket, if available."""
+        now = time.monotonic()
+        if len(self._buckets) > self.MAX_CLIENTS:
+            idle_since = now - self.burst / self.rate
+            self._buckets = {
+                key: bucket
+                for key, bucket in self._buckets.items()
+                if bucket[1] > idle_since
+            }
+
+        tokens, updated = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[client] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+    async def __call__(self, scope, receive, send):
+        """Reject API requests over the client's rate limit with a 429."""
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        if not self._allow(client[0] if client else ""):
+            logger.warning(f"Rate limit exceeded for {client}: {scope['path']}")
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, round(1 / self.rate)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
 # Initialize FastAPI app
-app = FastAPI(title="Invoice Processor API", version="1.0.0")
+app = FastAPI(
+    title="Invoice Processor API",
+    version="1.0.0",
+    default_response_class=OrjsonResponse,
+)
+
+# Added first so it sits inside CORS and 429 responses carry CORS headers
+app.add_middleware(RateLimitMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,10 +126,173 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize invoice extractor
-extractor = InvoiceFieldExtractor()
+# Compress larger JSON payloads (invoice lists, exports, raw_text)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 INVOICE_DIR = "invoices"
 
+# Blocking PDF work is handed off to this pool so the event loop keeps serving
+# requests. Threads keep the extraction cache in pdf_processor shared across
+# requests; uncached PDFs are still fanned out to worker processes there.
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# One blocking call per executor thread; up to MAX_QUEUED more wait on the event
+# loop, and anything beyond that is turned away with a 503
+MAX_IN_FLIGHT = os.cpu_count() or 1
+MAX_QUEUED = 2 * MAX_IN_FLIGHT
+_in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+_waiting = 0
+
+
+def _reject_if_busy() -> None:
+    """Raise a 503 when every executor slot is busy and the wait queue is full."""
+    if _in_flight.locked() and _waiting >= MAX_QUEUED:
+        logger.warning("Invoice executor saturated, rejecting request")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def run_in_executor(func, *args, wait: bool = False):
+    """Run a blocking call in the invoice executor without blocking the loop.
+
+    Raises a 503 ``HTTPException`` when the executor is saturated, unless
+    ``wait`` is set for work that has already been accepted.
+    """
+    global _waiting
+    if not wait:
+        _reject_if_busy()
+
+    _waiting += 1
+    try:
+        await _in_flight.acquire()
+    finally:
+        _waiting -= 1
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, partial(func, *args))
+    finally:
+        _in_flight.release()
+
+
+CSV_FIELDNAMES = (
+    "file_name",
+    "invoice_number",
+    "invoice_date",
+    "due_date",
+    "vendor_name",
+    "customer_name",
+    "subtotal",
+    "tax_amount",
+    "total_amount",
+    "confidence_score",
+)
+CSV_HEADER = ",".join(CSV_FIELDNAMES) + "\r\n"
+
+
+def _csv_escape(value) -> str:
+    """Format a CSV field, quoting only when needed (same output as csv.writer)."""
+    if value is None:
+        return ""
+    text = str(value)
+    if "," in text or '"' in text or "\n" in text or "\r" in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _stream_invoice_result(result: dict):
+    """Yield a directory result as JSON, serializing one invoice at a time."""
+    yield f'{{"total_processed": {result["total_processed"]}, "invoices": ['.encode()
+    for index, invoice in enumerate(result["invoices"]):
+        yield (b"," if index else b"") + orjson.dumps(invoice)
+    yield b'], "summary": ' + orjson.dumps(result["summary"]) + b"}"
+
+
+def _stream_csv_export(invoices: list[dict]):
+    """Yield the CSV export response, streaming one row at a time into ``data``."""
+    # orjson.dumps(...)[1:-1] escapes a chunk for use inside a JSON string
+    yield b'{"format": "csv", "data": "' + orjson.dumps(CSV_HEADER)[1:-1]
+    for inv in invoices:
+        row = ",".join(_csv_escape(inv.get(field, "")) for field in CSV_FIELDNAMES)
+        yield orjson.dumps(row + "\r\n")[1:-1]
+    yield f'", "count": {len(invoices)}}}'.encode()
+
+
+class InvoiceDetailsBatcher:
+    """Coalesces concurrent invoice detail lookups into one extraction pass.
+
+    Lookups are queued and drained every ``window`` seconds, or as soon as
+    ``max_batch`` distinct files are waiting, so a dashboard requesting many
+    details at once triggers a single extraction instead of one per file.
+    """
+
+    def __init__(self, window: float = 0.025, max_batch: int = 8):
+        """Initialize the batcher; the queue is bound lazily to the running loop."""
+        self.window = window
+        self.max_batch = max_batch
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def extract(self, pdf_path: str) -> ExtractedInvoice:
+        """Queue a file for extraction and wait for its invoice."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._drain())
+
+        future = loop.create_future()
+        await self._queue.put((pdf_path, future))
+        return await future
+
+    async def _collect(self) -> list[tuple[str, asyncio.Future]]:
+        """Wait for one lookup, then gather more until the window or size limit."""
+        batch = [await self._queue.get()]
+        paths = {batch[0][0]}
+        deadline = self._loop.time() + self.window
+
+        while len(paths) < self.max_batch:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except TimeoutError:
+                break
+            batch.append(item)
+            paths.add(item[0])
+
+        return batch
+
+    async def _drain(self) -> None:
+        """Extract queued files batch by batch and resolve their futures."""
+        while True:
+            batch = await self._collect()
+            paths = list(dict.fromkeys(path for path, _ in batch))
+            try:
+                # Every waiter was admitted by its endpoint, so never reject here
+                invoices = await run_in_executor(
+                    extract_invoices_cached, paths, wait=True
+                )
+            except Exception as e:
+                logger.error(f"Error extracting invoice batch: {e}")
+                invoices = {}
+
+            for path, future in batch:
+                if future.done():
+                    continue
+                if path in invoices:
+                    future.set_result(invoices[path])
+                else:
+                    future.set_exception(RuntimeError(f"Could not extract {path}"))
+
+
+details_batcher = InvoiceDetailsBatcher()
+
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_ui():
@@ -41,11 +304,19 @@ async def serve_ui():
 
 
 @app.get("/api/invoices")
-async def get_all_invoices():
+async def get_all_invoices(include_raw: bool = False):
     """Get all processed invoices with summary statistics."""
     try:
-        result = process_invoices_in_directory(INVOICE_DIR)
-        return result
+        # raw_text is by far the largest field and the UI does not use it
+        result = await run_in_executor(
+            process_invoices_in_directory, INVOICE_DIR, include_raw
+        )
+        return StreamingResponse(
+            _stream_invoice_result(result),
+            media_type="application/json",
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching invoices: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -55,48 +326,43 @@ async def get_all_invoices():
 async def get_invoice_summary():
     """Get invoice summary statistics."""
     try:
-        result = process_invoices_in_directory(INVOICE_DIR)
+        result = await run_in_executor(process_invoices_in_directory, INVOICE_DIR)
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
         
         return result.get("summary", {})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/invoices/search")
-async def search_invoices(query: str):
+async def search_invoices(query: str, include_raw: bool = False):
     """Search invoices by query string."""
     try:
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter required")
         
-        result = process_invoices_in_directory(INVOICE_DIR)
-        invoices = result.get("invoices", [])
-        query_lower = query.lower()
-        
-        matches = [
-            inv
-            for inv in invoices
-            if query_lower in inv.get("invoice_number", "").lower()
-            or query_lower in inv.get("invoice_date", "")
-            or query_lower in inv.get("file_name", "").lower()
-            or query_lower in inv.get("vendor_name", "").lower()
-        ]
+        matches = await run_in_executor(
+            search_invoices_in_directory, INVOICE_DIR, query, include_raw
+        )
         
         return {
             "query": query,
             "matches": len(matches),
             "invoices": matches
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching invoices: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/invoices/{file_name}")
-async def get_invoice_details(file_name: str):
+async def get_invoice_details(file_name: str, include_raw: bool = False):
     """Get detailed information for a specific invoice."""
     try:
         pdf_path = Path(INVOICE_DIR) / file_name
@@ -104,8 +370,12 @@ async def get_invoice_details(file_name: str):
         if not pdf_path.exists():
             raise HTTPException(status_code=404, detail="Invoice not found")
         
-        invoice = extractor.extract_invoice_fields(str(pdf_path))
-        return invoice.to_dict()
+        # Unchanged files are served straight from the cache
+        invoice = get_cached_invoice(str(pdf_path))
+        if invoice is None:
+            _reject_if_busy()
+            invoice = await details_batcher.extract(str(pdf_path))
+        return invoice.to_dict(include_raw)
     except HTTPException:
         raise
     except Exception as e:
@@ -114,51 +384,32 @@ async def get_invoice_details(file_name: str):
 
 
 @app.post("/api/invoices/export")
-async def export_invoices(output_format: str = "json"):
+async def export_invoices(output_format: str = "json", include_raw: bool = False):
     """Export all invoices in specified format."""
     try:
-        result = process_invoices_in_directory(INVOICE_DIR)
+        result = await run_in_executor(
+            process_invoices_in_directory, INVOICE_DIR, include_raw
+        )
         
         if output_format.lower() == "json":
-            return result
+            return StreamingResponse(
+                _stream_invoice_result(result),
+                media_type="application/json",
+            )
         elif output_format.lower() == "csv":
             # Simple CSV export
             invoices = result.get("invoices", [])
             if not invoices:
                 return {"error": "No invoices to export"}
-            
-            import csv
-            import io
-            
-            output = io.StringIO()
-            fieldnames = [
-                "file_name",
-                "invoice_number",
-                "invoice_date",
-                "due_date",
-                "vendor_name",
-                "customer_name",
-                "subtotal",
-                "tax_amount",
-                "total_amount",
-                "confidence_score"
-            ]
-            
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for inv in invoices:
-                row = {field: inv.get(field, "") for field in fieldnames}
-                writer.writerow(row)
-            
-            return {
-                "format": "csv",
-                "data": output.getvalue(),
-                "count": len(invoices)
-            }
+
+            return StreamingResponse(
+                _stream_csv_export(invoices), media_type="application/json"
+            )
         else:
             raise HTTPException(status_code=400, detail="Unsupported format")
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error exporting invoices: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -172,11 +423,11 @@ async def list_available_invoices():
         if not invoice_dir.exists():
             return {"error": f"Directory not found: {INVOICE_DIR}"}
         
-        invoices = list(invoice_dir.glob("*.pdf"))
+        invoices = list_pdf_entries(INVOICE_DIR)
         return {
             "directory": INVOICE_DIR,
             "count": len(invoices),
-            "files": [f.name for f in invoices]
+            "files": [entry.name for entry in invoices]
         }
     except Exception as e:
         logger.error(f"Error listing invoices: {e}")
@@ -191,4 +442,10 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # Each worker is a separate process with its own extraction cache, batcher
+    # and pools, so more workers means more cold extractions.
+    workers = int(os.getenv("INVOICE_API_WORKERS", "1"))
+
+    # uvicorn picks uvloop and httptools automatically when they are installed
+    uvicorn.run("src.invoice_api:app", host="0.0.0.0", port=8000, workers=workers)
@@ -1,11 +1,24 @@
 """PDF content reader and invoice field extractor using multi-agent approach."""
 
+import functools
 import json
 import logging
+import mmap
+import multiprocessing
+import os
 import re
-from dataclasses import asdict, dataclass, field
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 
 try:
     import PyPDF2
@@ -14,8 +27,16 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Directories with fewer uncached PDFs than this are extracted sequentially,
+# since process pool startup would outweigh the parallel speedup.
+PARALLEL_MIN_FILES = 4
+
+# PDFium is not thread-safe, not even across separate documents, so calls into
+# it are serialized. Parallelism comes from the per-file worker processes.
+_PDFIUM_LOCK = threading.Lock()
+
 
-@dataclass
+@dataclass(slots=True)
 class InvoiceField:
     """Represents an extracted invoice field."""
 
@@ -25,7 +46,17 @@ class InvoiceField:
     source: str = "extracted"
 
 
-@dataclass
+class InvoiceSummary(NamedTuple):
+    """Lightweight per-invoice row used for summary listings."""
+
+    file_name: str
+    invoice_number: str
+    invoice_date: str
+    total_amount: float
+    confidence: float
+
+
+@dataclass(slots=True)
 class ExtractedInvoice:
     """Represents a complete extracted invoice."""
 
@@ -44,33 +75,94 @@ class ExtractedInvoice:
     line_items: list = field(default_factory=list)
     raw_text: str = ""
     confidence_score: float = 0.0
-
-    def to_dict(self) -> dict:
-        """Convert to dictionary."""
-        return asdict(self)
+    # Set when the PDF could not be read; such results are never cached
+    extraction_failed: bool = False
+
+    def to_dict(self, include_raw: bool = False) -> dict:
+        """Convert to dictionary.
+
+        ``raw_text`` is large and only included when ``include_raw`` is set.
+        """
+        data = {
+            "file_name": self.file_name,
+            "invoice_number": self.invoice_number,
+            "invoice_date": self.invoice_date,
+            "due_date": self.due_date,
+            "vendor_name": self.vendor_name,
+            "vendor_address": self.vendor_address,
+            "customer_name": self.customer_name,
+            "customer_address": self.customer_address,
+            "subtotal": self.subtotal,
+            "tax_amount": self.tax_amount,
+            "total_amount": self.total_amount,
+            "currency": self.currency,
+            "line_items": list(self.line_items),
+        }
+        if include_raw:
+            data["raw_text"] = self.raw_text
+        data["confidence_score"] = self.confidence_score
+        return data
+
+    def to_summary(self) -> InvoiceSummary:
+        """Return the summary row for this invoice."""
+        return InvoiceSummary(
+            self.file_name,
+            self.invoice_number,
+            self.invoice_date,
+            self.total_amount,
+            self.confidence_score,
+        )
 
 
 class PDFContentReader:
-    """Reads and extracts text from PDF files."""
+    """Reads and extracts text from PDF files.
+
+    Uses PDFium (``pypdfium2``) when available and falls back to PyPDF2.
+    """
 
     @staticmethod
     def extract_text(pdf_path: str) -> str:
         """Extract text from PDF file."""
-        if PyPDF2 is None:
-            raise ImportError("PyPDF2 is required. Install with: pip install PyPDF2")
+        if pdfium is None and PyPDF2 is None:
+            raise ImportError(
+                "pypdfium2 or PyPDF2 is required. Install with: pip install pypdfium2"
+            )
 
         try:
-            text_content = []
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text_content.append(page.extract_text())
-            return "\n".join(text_content)
+            if pdfium is not None:
+                return PDFContentReader._extract_text_pdfium(pdf_path)
+            return PDFContentReader._extract_text_pypdf2(pdf_path)
         except Exception as e:
             logger.error(f"Error extracting text from {pdf_path}: {e}")
             raise
 
+    @staticmethod
+    def _extract_text_pdfium(pdf_path: str) -> str:
+        """Extract text with PDFium, opening the file by path (mapped natively)."""
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                text = "\n".join(page.get_textpage().get_text_range() for page in pdf)
+            finally:
+                pdf.close()
+        # PDFium emits CRLF line endings; normalize to match the PyPDF2 output
+        return text.replace("\r\n", "\n")
+
+    @staticmethod
+    def _extract_text_pypdf2(pdf_path: str) -> str:
+        """Extract text with PyPDF2, reading from a memory map of the file."""
+        text_content = []
+        with (
+            open(pdf_path, "rb") as pdf_file,
+            mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as pdf_map,
+        ):
+            # mmap is a seekable byte stream, so PyPDF2 reads it without copying
+            pdf_reader = PyPDF2.PdfReader(pdf_map)
+            for page_num in range(len(pdf_reader.pages)):
+                page = pdf_reader.pages[page_num]
+                text_content.append(page.extract_text())
+        return "\n".join(text_content)
+
 
 class PatternExtractor:
     """Extracts specific fields using regex patterns."""
@@ -107,13 +199,23 @@ class PatternExtractor:
         ],
     }
 
+    # Patterns compiled once at class load, in priority order. Each field's
+    # patterns are searched one after another rather than fused into a single
+    # alternation: a fused scan returns the leftmost hit of *any* pattern, so a
+    # loose fallback (e.g. "Invoice Address") would shadow a stronger match
+    # further down the page.
+    _COMPILED = {
+        field_type: [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in patterns]
+        for field_type, patterns in PATTERNS.items()
+    }
+
     @staticmethod
     def extract_field(text: str, field_type: str) -> tuple[str | None, float]:
         """Extract a field using patterns with confidence scoring."""
-        patterns = PatternExtractor.PATTERNS.get(field_type, [])
+        patterns = PatternExtractor._COMPILED.get(field_type, [])
 
         for pattern_idx, pattern in enumerate(patterns):
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+            match = pattern.search(text)
             if match:
                 value = match.group(1).strip()
                 # Higher confidence for earlier patterns
@@ -122,29 +224,30 @@ class PatternExtractor:
 
         return None, 0.0
 
+    # Header words that mark a line as something other than the vendor name
+    _VENDOR_REJECT = re.compile(r"invoice|bill|receipt|quote|date:", re.IGNORECASE)
+
     @staticmethod
     def extract_vendor_name(text: str) -> tuple[str, float]:
         """Extract vendor name from invoice."""
-        lines = text.split("\n")
-        # Usually vendor name is in the first few non-empty lines
-        for line in lines[:20]:
+        # Usually vendor name is in the first few non-empty lines; maxsplit
+        # avoids splitting the rest of a multi-page document
+        for line in text.split("\n", 20)[:20]:
             stripped = line.strip()
-            if stripped and len(stripped) > 5 and len(stripped) < 100:
-                # Skip common header words
-                if not any(
-                    keyword in stripped.lower()
-                    for keyword in [
-                        "invoice",
-                        "bill",
-                        "receipt",
-                        "quote",
-                        "date:",
-                        "invoice #",
-                    ]
-                ):
-                    return stripped, 0.7
+            if not 5 < len(stripped) < 100:
+                continue
+            # Skip common header words
+            if not PatternExtractor._VENDOR_REJECT.search(stripped):
+                return stripped, 0.7
         return "", 0.0
 
+    @staticmethod
+    def parse_amount(amount: str) -> float:
+        """Convert a captured amount such as ``1,234.56`` to a float."""
+        # The amount patterns capture [0-9,]+\.[0-9]{2}, so thousands separators
+        # are the only characters float() cannot handle; "$" is never captured
+        return float(amount.replace(",", "") if "," in amount else amount)
+
     @staticmethod
     def extract_amounts(text: str) -> dict[str, tuple[float, float]]:
         """Extract all amounts from text."""
@@ -153,18 +256,12 @@ class PatternExtractor:
         # Extract total
         total_str, total_conf = PatternExtractor.extract_field(text, "total_amount")
         if total_str:
-            amounts["total"] = (
-                float(total_str.replace(",", "").replace("$", "")),
-                total_conf,
-            )
+            amounts["total"] = (PatternExtractor.parse_amount(total_str), total_conf)
 
         # Extract tax
         tax_str, tax_conf = PatternExtractor.extract_field(text, "tax_amount")
         if tax_str:
-            amounts["tax"] = (
-                float(tax_str.replace(",", "").replace("$", "")),
-                tax_conf,
-            )
+            amounts["tax"] = (PatternExtractor.parse_amount(tax_str), tax_conf)
 
         # Extract subtotal
         subtotal_str, subtotal_conf = PatternExtractor.extract_field(
@@ -172,7 +269,7 @@ class PatternExtractor:
         )
         if subtotal_str:
             amounts["subtotal"] = (
-                float(subtotal_str.replace(",", "").replace("$", "")),
+                PatternExtractor.parse_amount(subtotal_str),
                 subtotal_conf,
             )
 
@@ -184,8 +281,9 @@ class InvoiceFieldExtractor:
 
     def __init__(self):
         """Initialize extractor with PDF reader and pattern matcher."""
-        self.pdf_reader = PDFContentReader()
-        self.pattern_extractor = PatternExtractor()
+        # Both components are stateless, so every extractor shares one instance
+        self.pdf_reader = _PDF_READER
+        self.pattern_extractor = _PATTERN_EXTRACTOR
 
     def extract_invoice_fields(self, pdf_path: str) -> ExtractedInvoice:
         """Extract invoice fields from PDF using multi-agent approach."""
@@ -245,43 +343,358 @@ class InvoiceFieldExtractor:
 
         except Exception as e:
             logger.error(f"Error extracting invoice fields from {pdf_path}: {e}")
+            invoice.extraction_failed = True
 
         return invoice
 
     def extract_multiple_invoices(self, directory: str) -> list[ExtractedInvoice]:
         """Extract invoices from all PDFs in a directory."""
-        invoices = []
-        pdf_dir = Path(directory)
-
-        if not pdf_dir.exists():
+        if not Path(directory).exists():
             logger.warning(f"Directory not found: {directory}")
-            return invoices
+            return []
+
+        signatures = _scan_pdf_signatures(directory)
+        if self is DEFAULT_EXTRACTOR:
+            return list(_extract_signatures(signatures).values())
 
-        for pdf_file in pdf_dir.glob("*.pdf"):
+        # Other extractors may be customized, so they bypass the shared cache
+        invoices = []
+        for path, _, _ in signatures:
             try:
-                invoice = self.extract_invoice_fields(str(pdf_file))
-                invoices.append(invoice)
+                invoices.append(self.extract_invoice_fields(path))
             except Exception as e:
-                logger.error(f"Error processing {pdf_file}: {e}")
-
+                logger.error(f"Error processing {path}: {e}")
         return invoices
 
 
-def process_invoices_in_directory(directory: str) -> dict:
-    """Process all invoices in a directory and return results."""
-    extractor = InvoiceFieldExtractor()
-    invoices = extractor.extract_multiple_invoices(directory)
+_PDF_READER = PDFContentReader()
+_PATTERN_EXTRACTOR = PatternExtractor()
+
+# Default extractor behind the cached helpers (one cache per process)
+DEFAULT_EXTRACTOR = InvoiceFieldExtractor()
+
+
+def list_pdf_entries(directory: str) -> list[os.DirEntry]:
+    """List the PDF files in a directory, sorted by name.
 
+    ``os.DirEntry`` objects reuse the file type from the directory read and
+    cache ``stat()``, so callers can build cache keys without extra syscalls.
+    """
+    with os.scandir(directory) as entries:
+        pdf_entries = [
+            entry
+            for entry in entries
+            if entry.name.lower().endswith(".pdf") and entry.is_file()
+        ]
+    return sorted(pdf_entries, key=lambda entry: entry.name)
+
+
+def _scan_pdf_signatures(directory: str) -> tuple[tuple[str, int, int], ...]:
+    """Return a ``(path, mtime_ns, size)`` tuple for each PDF in a directory."""
+    signatures = []
+    for entry in list_pdf_entries(directory):
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            # Deleted or replaced between the directory read and the stat
+            logger.warning(f"Skipping {entry.path}: {e}")
+            continue
+        signatures.append((entry.path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signatures)
+
+
+_INVOICE_CACHE_SIZE = 1024
+_invoice_cache: OrderedDict[tuple[str, int, int], ExtractedInvoice] = OrderedDict()
+_invoice_cache_lock = threading.Lock()
+
+
+def _cache_get(key: tuple[str, int, int]) -> ExtractedInvoice | None:
+    """Return a cached invoice and mark it as most recently used."""
+    with _invoice_cache_lock:
+        invoice = _invoice_cache.get(key)
+        if invoice is not None:
+            _invoice_cache.move_to_end(key)
+        return invoice
+
+
+def _cache_put(key: tuple[str, int, int], invoice: ExtractedInvoice) -> None:
+    """Store an invoice, evicting the least recently used entries.
+
+    Failed extractions are not stored, so they are retried on the next call
+    instead of sticking until the file changes. PDFs that read fine but have no
+    text, e.g. scans, are cached like any other result.
+    """
+    if invoice.extraction_failed:
+        return
+    with _invoice_cache_lock:
+        _invoice_cache[key] = invoice
+        _invoice_cache.move_to_end(key)
+        while len(_invoice_cache) > _INVOICE_CACHE_SIZE:
+            _invoice_cache.popitem(last=False)
+
+
+def _extract_one(path: str) -> ExtractedInvoice:
+    """Extract a single invoice; module-level so it can run in a worker process."""
+    return DEFAULT_EXTRACTOR.extract_invoice_fields(path)
+
+
+def _extract_cached(path: str, mtime_ns: int, size: int) -> ExtractedInvoice:
+    """Extract a single invoice, memoized on the file's stat signature.
+
+    A modified file gets a new ``(mtime_ns, size)`` key, so stale entries are
+    never returned and simply age out of the LRU.
+    """
+    key = (path, mtime_ns, size)
+    invoice = _cache_get(key)
+    if invoice is None:
+        invoice = _extract_one(path)
+        _cache_put(key, invoice)
+    return invoice
+
+
+_POOL_WORKERS = int((os.cpu_count() or 1) * 1.5)
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared extraction worker pool, starting it on first use.
+
+    Workers are started with forkserver (or spawn), so they never inherit locks
+    or PDFium state held by other threads, e.g. API requests, at fork time.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            if context.get_start_method() == "forkserver":
+                # Workers fork from a server that has already imported this
+                # module and the PDF libraries. ``__main__`` stays preloaded so
+                # it is imported once there rather than in every worker; scripts
+                # still need a ``__main__`` guard. Set here, not at import, so
+                # hosts that never start the pool keep their own preload list.
+                context.set_forkserver_preload(["__main__", __name__])
+            _pool = ProcessPoolExecutor(max_workers=_POOL_WORKERS, mp_context=context)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Shut down a failed pool so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_in_pool(
+    signatures: list[tuple[str, int, int]],
+) -> dict[str, ExtractedInvoice]:
+    """Extract uncached invoices in parallel worker processes and cache them.
+
+    Returns the invoices that came back, by path, so callers can use them even
+    when they were not cached (failed extractions).
+    """
+    paths = [path for path, _, _ in signatures]
+    chunksize = max(1, min(4, len(paths) // _POOL_WORKERS))
+    invoices = {}
+    pool = _get_pool()
+    try:
+        for signature, invoice in zip(
+            signatures, pool.map(_extract_one, paths, chunksize=chunksize)
+        ):
+            _cache_put(signature, invoice)
+            invoices[signature[0]] = invoice
+    except Exception as e:
+        # Whatever was not cached is picked up by the sequential path
+        logger.warning(
+            f"Parallel invoice extraction failed, continuing sequentially: {e!r}"
+        )
+        _discard_pool(pool)
+    return invoices
+
+
+def _extract_signatures(
+    signatures: tuple[tuple[str, int, int], ...],
+) -> dict[str, ExtractedInvoice]:
+    """Extract (or fetch from cache) the invoice for every signature, by path."""
+    misses = [signature for signature in signatures if _cache_get(signature) is None]
+    extracted = {}
+    if len(misses) >= PARALLEL_MIN_FILES:
+        extracted = _extract_in_pool(misses)
+
+    invoices = {}
+    for path, mtime_ns, size in signatures:
+        try:
+            # Pool results are used as is, so an uncached one is not re-extracted
+            invoice = extracted.get(path)
+            if invoice is None:
+                invoice = _extract_cached(path, mtime_ns, size)
+            invoices[path] = invoice
+        except Exception as e:
+            logger.error(f"Error processing {path}: {e}")
+    return invoices
+
+
+def extract_invoice_cached(pdf_path: str) -> ExtractedInvoice:
+    """Extract a single invoice, reusing the result while the file is unchanged."""
+    stat = os.stat(pdf_path)
+    return _extract_cached(str(pdf_path), stat.st_mtime_ns, stat.st_size)
+
+
+def get_cached_invoice(pdf_path: str) -> ExtractedInvoice | None:
+    """Return the cached invoice for an unchanged file, without extracting."""
+    stat = os.stat(pdf_path)
+    return _cache_get((str(pdf_path), stat.st_mtime_ns, stat.st_size))
+
+
+def extract_invoices_cached(pdf_paths: list[str]) -> dict[str, ExtractedInvoice]:
+    """Extract several invoices in one pass, keyed by path.
+
+    Uncached files share the worker pool used for directory extraction. Paths
+    that cannot be read are left out of the result.
+    """
+    signatures = []
+    for pdf_path in pdf_paths:
+        try:
+            stat = os.stat(pdf_path)
+        except OSError as e:
+            logger.error(f"Error processing {pdf_path}: {e}")
+            continue
+        signatures.append((str(pdf_path), stat.st_mtime_ns, stat.st_size))
+
+    return _extract_signatures(tuple(signatures))
+
+
+def _snapshot_memo(func):
+    """Memoize ``func(signatures, *args)`` per directory snapshot.
+
+    Works like ``functools.lru_cache(maxsize=16)``, except that a result is only
+    stored once every file in the snapshot has a cached (successful)
+    extraction; snapshots with failed files are rebuilt on the next call.
+    """
+    cache: OrderedDict[tuple, Any] = OrderedDict()
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(signatures: tuple[tuple[str, int, int], ...], *args):
+        key = (signatures, *args)
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+        value = func(signatures, *args)
+        if all(_cache_get(signature) is not None for signature in signatures):
+            with lock:
+                cache[key] = value
+                while len(cache) > 16:
+                    cache.popitem(last=False)
+        return value
+
+    return wrapper
+
+
+def _summary_totals(invoices: Sequence[ExtractedInvoice]) -> dict:
+    """Build the summary statistics for a list of invoices."""
+    return {
+        "total_amount": sum(inv.total_amount for inv in invoices),
+        "total_tax": sum(inv.tax_amount for inv in invoices),
+        "average_confidence": (
+            sum(inv.confidence_score for inv in invoices) / len(invoices)
+            if invoices
+            else 0
+        ),
+    }
+
+
+def _build_result(invoices: Sequence[ExtractedInvoice], include_raw: bool) -> dict:
+    """Build the directory result dict for a list of invoices."""
     return {
         "total_processed": len(invoices),
-        "invoices": [inv.to_dict() for inv in invoices],
-        "summary": {
-            "total_amount": sum(inv.total_amount for inv in invoices),
-            "total_tax": sum(inv.tax_amount for inv in invoices),
-            "average_confidence": (
-                sum(inv.confidence_score for inv in invoices) / len(invoices)
-                if invoices
-                else 0
-            ),
-        },
+        "invoices": [inv.to_dict(include_raw) for inv in invoices],
+        "summary": _summary_totals(invoices),
     }
+
+
+@_snapshot_memo
+def _snapshot_invoices(
+    signatures: tuple[tuple[str, int, int], ...],
+) -> tuple[ExtractedInvoice, ...]:
+    """Extract the invoices for a set of files, memoized on their signatures."""
+    return tuple(_extract_signatures(signatures).values())
+
+
+def _directory_signatures(directory: str) -> tuple[tuple[str, int, int], ...]:
+    """Return the cache key for a directory, or an empty key if it is missing."""
+    if not Path(directory).exists():
+        logger.warning(f"Directory not found: {directory}")
+        return ()
+    return _scan_pdf_signatures(directory)
+
+
+def process_invoices_in_directory(
+    directory: str,
+    include_raw: bool = False,
+    extractor: InvoiceFieldExtractor | None = None,
+) -> dict:
+    """Process all invoices in a directory and return results.
+
+    With the default extractor, invoices are cached per directory snapshot:
+    repeated calls only pay for a single ``scandir`` and building the result
+    until a PDF is added, removed or modified. Each call gets its own dict.
+    """
+    if extractor is not None and extractor is not DEFAULT_EXTRACTOR:
+        invoices = extractor.extract_multiple_invoices(directory)
+        return _build_result(invoices, include_raw)
+
+    invoices = _snapshot_invoices(_directory_signatures(directory))
+    return _build_result(invoices, include_raw)
+
+
+@_snapshot_memo
+def _search_index(
+    signatures: tuple[tuple[str, int, int], ...],
+) -> tuple[tuple[ExtractedInvoice, str], ...]:
+    """Pair each invoice with its lowercased searchable text."""
+    # "\0" keeps a query from matching across the boundary of two fields
+    return tuple(
+        (
+            inv,
+            "\0".join(
+                (inv.invoice_number, inv.invoice_date, inv.file_name, inv.vendor_name)
+            ).lower(),
+        )
+        for inv in _snapshot_invoices(signatures)
+    )
+
+
+def search_invoices_in_directory(
+    directory: str, query: str, include_raw: bool = False
+) -> list[dict]:
+    """Return the invoices whose number, date, file name or vendor contain query.
+
+    Matching is case-insensitive and runs against lowercased text cached per
+    directory snapshot, so each search is a single substring check per invoice.
+    """
+    query_lower = query.lower()
+    return [
+        inv.to_dict(include_raw)
+        for inv, blob in _search_index(_directory_signatures(directory))
+        if query_lower in blob
+    ]
+
+
+def summarize_invoices_in_directory(
+    directory: str,
+) -> tuple[dict, tuple[InvoiceSummary, ...]]:
+    """Return the summary totals and one row per invoice in a directory.
+
+    Both come from a single directory scan, so the totals always describe the
+    same files as the rows. Cached like ``process_invoices_in_directory``.
+    """
+    invoices = _snapshot_invoices(_directory_signatures(directory))
+    return _summary_totals(invoices), tuple(inv.to_summary() for inv in invoices)
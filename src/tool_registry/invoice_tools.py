@@ -16,27 +16,31 @@ def register_invoice_tools(mcp: FastMCP) -> None:
     """Register invoice processing tools with the MCP server."""
 
     @mcp.tool()
-    def process_single_invoice(file_name: str) -> dict:
+    def process_single_invoice(file_name: str, include_raw: bool = False) -> dict:
         """
         Process a single invoice PDF and extract key fields.
 
         Args:
             file_name: Name of the PDF file (e.g., 'demo-invoice-20tax-2.pdf')
+            include_raw: Also return the full extracted text (raw_text)
 
         Returns:
             Extracted invoice data including number, date, amounts, etc.
         """
-        return invoice_tools.process_single_invoice(file_name)
+        return invoice_tools.process_single_invoice(file_name, include_raw)
 
     @mcp.tool()
-    def process_all_invoices() -> dict:
+    def process_all_invoices(include_raw: bool = False) -> dict:
         """
         Process all invoices in the invoices directory.
 
+        Args:
+            include_raw: Also return each invoice's full extracted text (raw_text)
+
         Returns:
             Summary of all processed invoices with statistics
         """
-        return invoice_tools.process_all_invoices()
+        return invoice_tools.process_all_invoices(include_raw)
 
     @mcp.tool()
     def list_invoices() -> dict:
@@ -59,42 +63,45 @@ def register_invoice_tools(mcp: FastMCP) -> None:
         return invoice_tools.get_invoice_summary()
 
     @mcp.tool()
-    def search_invoices(query: str) -> dict:
+    def search_invoices(query: str, include_raw: bool = False) -> dict:
         """
-        Search invoices by invoice number, date, or file name.
+        Search invoices by invoice number, date, file name, or vendor name.
 
         Args:
-            query: Search term (invoice number, date, or file name)
+            query: Search term (invoice number, date, file name, or vendor name)
+            include_raw: Also return each match's full extracted text (raw_text)
 
         Returns:
             Matching invoices
         """
-        return invoice_tools.search_invoices(query)
+        return invoice_tools.search_invoices(query, include_raw)
 
     @mcp.tool()
-    def get_invoice_details(file_name: str) -> dict:
+    def get_invoice_details(file_name: str, include_raw: bool = False) -> dict:
         """
         Get detailed information for a specific invoice.
 
         Args:
             file_name: Name of the invoice PDF file
+            include_raw: Also return the full extracted text (raw_text)
 
         Returns:
             Complete invoice details with extracted fields
         """
-        return invoice_tools.get_invoice_details(file_name)
+        return invoice_tools.get_invoice_details(file_name, include_raw)
 
     @mcp.tool()
-    def export_invoices(output_file: str = None) -> dict:
+    def export_invoices(output_file: str = None, include_raw: bool = False) -> dict:
         """
         Export all invoices as JSON format.
 
         Args:
             output_file: Optional path to save the JSON file
+            include_raw: Also export each invoice's full extracted text (raw_text)
 
         Returns:
             Export status and data
         """
-        return invoice_tools.export_invoices_as_json(output_file)
+        return invoice_tools.export_invoices_as_json(output_file, include_raw)
 
     logger.info("Invoice tools registered successfully")
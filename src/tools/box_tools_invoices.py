@@ -1,13 +1,17 @@
 """Tools for processing and managing invoices through the MCP server."""
 
-import json
 import logging
 from pathlib import Path
 
+import orjson
+
 from pdf_processor import (
     ExtractedInvoice,
-    InvoiceFieldExtractor,
+    extract_invoice_cached,
+    list_pdf_entries,
     process_invoices_in_directory,
+    search_invoices_in_directory,
+    summarize_invoices_in_directory,
 )
 
 logger = logging.getLogger(__name__)
@@ -19,15 +23,14 @@ class InvoiceTools:
     def __init__(self, invoice_directory: str = "invoices"):
         """Initialize invoice tools."""
         self.invoice_directory = invoice_directory
-        self.extractor = InvoiceFieldExtractor()
-        self._cache = {}
 
-    def process_single_invoice(self, file_name: str) -> dict:
+    def process_single_invoice(self, file_name: str, include_raw: bool = False) -> dict:
         """
         Process a single invoice PDF and extract fields.
 
         Args:
             file_name: Name of the PDF file in the invoice directory
+            include_raw: Also return the extracted text as ``raw_text``
 
         Returns:
             Dictionary with extracted invoice data
@@ -38,24 +41,25 @@ class InvoiceTools:
             return {"error": f"Invoice file not found: {file_name}"}
 
         try:
-            invoice = self.extractor.extract_invoice_fields(str(pdf_path))
-            result = invoice.to_dict()
-            # Cache the result
-            self._cache[file_name] = result
-            return result
+            # Cached per process; edited files are re-extracted
+            invoice = extract_invoice_cached(str(pdf_path))
+            return invoice.to_dict(include_raw)
         except Exception as e:
             logger.error(f"Error processing invoice {file_name}: {e}")
             return {"error": str(e)}
 
-    def process_all_invoices(self) -> dict:
+    def process_all_invoices(self, include_raw: bool = False) -> dict:
         """
         Process all invoices in the invoice directory.
 
+        Args:
+            include_raw: Also return each invoice's extracted text as ``raw_text``
+
         Returns:
             Dictionary with all extracted invoices and summary statistics
         """
         try:
-            result = process_invoices_in_directory(self.invoice_directory)
+            result = process_invoices_in_directory(self.invoice_directory, include_raw)
             return result
         except Exception as e:
             logger.error(f"Error processing invoices: {e}")
@@ -73,11 +77,11 @@ class InvoiceTools:
             if not invoice_dir.exists():
                 return {"error": f"Invoice directory not found: {self.invoice_directory}"}
 
-            invoices = list(invoice_dir.glob("*.pdf"))
+            invoices = list_pdf_entries(self.invoice_directory)
             return {
                 "directory": self.invoice_directory,
                 "count": len(invoices),
-                "files": [f.name for f in invoices],
+                "files": [entry.name for entry in invoices],
             }
         except Exception as e:
             logger.error(f"Error listing invoices: {e}")
@@ -91,100 +95,79 @@ class InvoiceTools:
             Dictionary with invoice statistics
         """
         try:
-            result = process_invoices_in_directory(self.invoice_directory)
-            if "error" in result:
-                return result
-
-            invoices = result.get("invoices", [])
-            if not invoices:
+            summary, rows = summarize_invoices_in_directory(self.invoice_directory)
+            if not rows:
                 return {"total_invoices": 0, "summary": {}}
 
             return {
-                "total_invoices": len(invoices),
-                "total_amount": result["summary"]["total_amount"],
-                "total_tax": result["summary"]["total_tax"],
-                "average_confidence": result["summary"]["average_confidence"],
-                "invoices": [
-                    {
-                        "file_name": inv["file_name"],
-                        "invoice_number": inv["invoice_number"],
-                        "invoice_date": inv["invoice_date"],
-                        "total_amount": inv["total_amount"],
-                        "confidence": inv["confidence_score"],
-                    }
-                    for inv in invoices
-                ],
+                "total_invoices": len(rows),
+                "total_amount": summary["total_amount"],
+                "total_tax": summary["total_tax"],
+                "average_confidence": summary["average_confidence"],
+                "invoices": [row._asdict() for row in rows],
             }
         except Exception as e:
             logger.error(f"Error getting invoice summary: {e}")
             return {"error": str(e)}
 
-    def search_invoices(self, query: str) -> dict:
+    def search_invoices(self, query: str, include_raw: bool = False) -> dict:
         """
-        Search invoices by invoice number or date.
+        Search invoices by invoice number, date, file name or vendor.
 
         Args:
-            query: Search query (invoice number or partial date)
+            query: Search query (invoice number, partial date, file or vendor name)
+            include_raw: Also return each match's extracted text as ``raw_text``
 
         Returns:
             List of matching invoices
         """
         try:
-            result = process_invoices_in_directory(self.invoice_directory)
-            if "error" in result:
-                return result
-
-            invoices = result.get("invoices", [])
-            query_lower = query.lower()
-
-            matches = [
-                inv
-                for inv in invoices
-                if query_lower in inv["invoice_number"].lower()
-                or query_lower in inv["invoice_date"]
-                or query_lower in inv["file_name"].lower()
-            ]
+            matches = search_invoices_in_directory(
+                self.invoice_directory, query, include_raw
+            )
 
             return {"query": query, "matches": len(matches), "invoices": matches}
         except Exception as e:
             logger.error(f"Error searching invoices: {e}")
             return {"error": str(e)}
 
-    def get_invoice_details(self, file_name: str) -> dict:
+    def get_invoice_details(self, file_name: str, include_raw: bool = False) -> dict:
         """
         Get detailed information for a specific invoice.
 
         Args:
             file_name: Name of the invoice PDF file
+            include_raw: Also return the extracted text as ``raw_text``
 
         Returns:
             Detailed invoice information
         """
-        if file_name in self._cache:
-            return self._cache[file_name]
-
-        return self.process_single_invoice(file_name)
+        # process_single_invoice is served from the shared extraction cache
+        return self.process_single_invoice(file_name, include_raw)
 
-    def export_invoices_as_json(self, output_file: str = None) -> dict:
+    def export_invoices_as_json(
+        self, output_file: str = None, include_raw: bool = False
+    ) -> dict:
         """
         Export all invoices as JSON.
 
         Args:
             output_file: Optional path to save JSON file
+            include_raw: Also export each invoice's extracted text as ``raw_text``
 
         Returns:
             Dictionary with export result
         """
         try:
-            result = process_invoices_in_directory(self.invoice_directory)
+            result = process_invoices_in_directory(self.invoice_directory, include_raw)
             if "error" in result:
                 return result
 
             if output_file:
                 output_path = Path(output_file)
                 output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, "w") as f:
-                    json.dump(result, f, indent=2)
+                with open(output_path, "wb") as f:
+                    f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
                 return {"status": "success", "saved_to": str(output_path)}
 
             return {"status": "success", "data": result}
@@ -0,0 +1,211 @@
+"""Test the invoice API server."""
+
+import asyncio
+import csv
+import io
+import json
+import threading
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse
+
+from src import invoice_api
+from src.pdf_processor import ExtractedInvoice
+
+
+@pytest_asyncio.fixture
+async def batcher():
+    """Create a details batcher and stop its drain task afterwards."""
+    batcher = invoice_api.InvoiceDetailsBatcher(window=0.05)
+    yield batcher
+    if batcher._task is not None:
+        batcher._task.cancel()
+
+
+@pytest.fixture
+def extract_calls(monkeypatch):
+    """Replace batch extraction with a fake that records each call."""
+    calls = []
+
+    def fake_extract(pdf_paths):
+        calls.append(list(pdf_paths))
+        return {path: ExtractedInvoice(file_name=path) for path in pdf_paths}
+
+    monkeypatch.setattr(invoice_api, "extract_invoices_cached", fake_extract)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_batcher_merges_concurrent_lookups(batcher, extract_calls):
+    """Test that concurrent cold lookups share one extraction call."""
+    paths = [f"invoice-{i % 4}.pdf" for i in range(10)]
+    invoices = await asyncio.gather(*(batcher.extract(path) for path in paths))
+
+    assert len(extract_calls) == 1
+    assert sorted(extract_calls[0]) == sorted(set(paths))
+    assert [invoice.file_name for invoice in invoices] == paths
+
+
+@pytest.mark.asyncio
+async def test_batcher_missing_path_raises(batcher, monkeypatch):
+    """Test that a file missing from the batch result fails instead of hanging."""
+    monkeypatch.setattr(invoice_api, "extract_invoices_cached", lambda paths: {})
+
+    with pytest.raises(RuntimeError, match="missing.pdf"):
+        await asyncio.wait_for(batcher.extract("missing.pdf"), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_batcher_skips_cancelled_waiter(batcher, extract_calls):
+    """Test that a cancelled lookup does not break the rest of its batch."""
+    cancelled = asyncio.create_task(batcher.extract("cancelled.pdf"))
+    kept = asyncio.create_task(batcher.extract("kept.pdf"))
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+
+    assert (await asyncio.wait_for(kept, timeout=1)).file_name == "kept.pdf"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    later = await asyncio.wait_for(batcher.extract("later.pdf"), timeout=1)
+    assert later.file_name == "later.pdf"
+    assert len(extract_calls) == 2
+
+
+def test_csv_export_matches_dictwriter():
+    """Test that the streamed CSV export matches csv.DictWriter output."""
+    tricky = ['Acme, Inc.', 'The "Best" Vendor', "Line one\nLine two", "CR\rLF", ""]
+    invoices = [
+        {
+            field: tricky[(row + column) % len(tricky)]
+            for column, field in enumerate(invoice_api.CSV_FIELDNAMES)
+        }
+        for row in range(len(tricky))
+    ]
+    invoices.append({"file_name": "partial.pdf", "subtotal": 12.5, "due_date": None})
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=invoice_api.CSV_FIELDNAMES)
+    writer.writeheader()
+    for invoice in invoices:
+        writer.writerow({field: invoice.get(field, "") for field in writer.fieldnames})
+
+    body = b"".join(invoice_api._stream_csv_export(invoices))
+    assert json.loads(body) == {
+        "format": "csv",
+        "data": output.getvalue(),
+        "count": len(invoices),
+    }
+
+
+def api_client(host: str) -> TestClient:
+    """Create a test client; each test uses its own host for rate limiting."""
+    return TestClient(invoice_api.app, client=(host, 50000))
+
+
+def test_list_invoices_is_json():
+    """Test that the streamed invoice list parses as a JSON document."""
+    response = api_client("10.0.11.1").get("/api/invoices")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    result = json.loads(response.content)
+    assert result["total_processed"] == len(result["invoices"]) > 0
+    assert "total_amount" in result["summary"]
+
+
+def test_raw_text_is_opt_in():
+    """Test that raw_text is only returned when include_raw is set."""
+    client = api_client("10.0.11.2")
+    invoices = client.get("/api/invoices").json()["invoices"]
+    assert all("raw_text" not in invoice for invoice in invoices)
+
+    invoices = client.get("/api/invoices", params={"include_raw": "true"}).json()
+    assert all(invoice["raw_text"] for invoice in invoices["invoices"])
+
+    file_name = invoices["invoices"][0]["file_name"]
+    assert "raw_text" not in client.get(f"/api/invoices/{file_name}").json()
+    detail = client.get(f"/api/invoices/{file_name}", params={"include_raw": "true"})
+    assert detail.json()["raw_text"]
+
+
+def test_large_responses_are_gzipped():
+    """Test that large bodies are gzip-compressed when the client accepts it."""
+    response = api_client("10.0.11.3").get(
+        "/api/invoices", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.content) > 1024
+
+
+def test_rate_limit_bucket_refills(monkeypatch):
+    """Test that a client's bucket refills at the configured rate up to the burst."""
+    now = [100.0]
+    monkeypatch.setattr(invoice_api.time, "monotonic", lambda: now[0])
+    limiter = invoice_api.RateLimitMiddleware(None, rate=2.0, burst=3)
+
+    assert [limiter._allow("client") for _ in range(4)] == [True, True, True, False]
+    assert limiter._allow("other")
+
+    now[0] += 0.5
+    assert [limiter._allow("client") for _ in range(2)] == [True, False]
+
+    now[0] += 60
+    assert [limiter._allow("client") for _ in range(4)] == [True, True, True, False]
+
+
+def test_rate_limit_returns_429_with_retry_after():
+    """Test that requests over the limit get a 429 with a Retry-After header."""
+
+    async def ok_app(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    client = TestClient(invoice_api.RateLimitMiddleware(ok_app, rate=0.5, burst=2))
+
+    assert [client.get("/api/invoices").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/api/invoices")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+    assert response.json() == {"detail": "Too many requests"}
+
+    assert client.get("/health").status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_executor_rejects_when_saturated(monkeypatch):
+    """Test that work is rejected with a 503 once the wait queue is full."""
+    monkeypatch.setattr(invoice_api, "_in_flight", asyncio.Semaphore(1))
+    monkeypatch.setattr(invoice_api, "MAX_QUEUED", 1)
+    release = threading.Event()
+
+    running = asyncio.create_task(invoice_api.run_in_executor(release.wait, 5))
+    queued = asyncio.create_task(invoice_api.run_in_executor(lambda: "queued"))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await invoice_api.run_in_executor(lambda: "rejected")
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+
+    admitted = asyncio.create_task(
+        invoice_api.run_in_executor(lambda: "admitted", wait=True)
+    )
+    release.set()
+    assert await asyncio.wait_for(
+        asyncio.gather(running, queued, admitted), timeout=5
+    ) == [True, "queued", "admitted"]
+    assert invoice_api._waiting == 0
+
+
+def test_saturated_endpoint_returns_503(monkeypatch):
+    """Test that endpoints pass the 503 through instead of turning it into a 500."""
+    monkeypatch.setattr(invoice_api, "_in_flight", asyncio.Semaphore(0))
+    monkeypatch.setattr(invoice_api, "MAX_QUEUED", 0)
+
+    response = api_client("10.0.21.1").get("/api/invoices/summary")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -57,6 +57,7 @@ def test_invoice_summary(invoice_tools):
     assert "error" not in result or not result["error"]
     assert "total_invoices" in result
     assert result["total_invoices"] > 0
+    assert result["total_invoices"] == len(result["invoices"])
     assert "total_amount" in result
     assert "total_tax" in result
     assert "average_confidence" in result
@@ -76,6 +77,18 @@ def test_search_invoices(invoice_tools):
         assert result["matches"] > 0
 
 
+def test_search_invoices_by_vendor(invoice_tools):
+    """Test that search matches vendor names case-insensitively."""
+    details = invoice_tools.process_all_invoices()["invoices"]
+    vendor = next(inv["vendor_name"] for inv in details if inv["vendor_name"])
+
+    result = invoice_tools.search_invoices(vendor.upper())
+    assert result["matches"] > 0
+    assert all(
+        vendor.lower() in inv["vendor_name"].lower() for inv in result["invoices"]
+    )
+
+
 def test_export_invoices(invoice_tools, tmp_path):
     """Test exporting invoices."""
     output_file = tmp_path / "invoices_export.json"
@@ -104,6 +117,26 @@ def test_invoice_details(invoice_tools):
         assert "confidence_score" in result
 
 
+def test_tools_raw_text_opt_in(invoice_tools):
+    """Test that the tools only return raw_text when include_raw is set."""
+    file_name = invoice_tools.list_invoices()["files"][0]
+
+    assert "raw_text" not in invoice_tools.process_single_invoice(file_name)
+    assert invoice_tools.process_single_invoice(file_name, include_raw=True)["raw_text"]
+    assert invoice_tools.get_invoice_details(file_name, include_raw=True)["raw_text"]
+
+    for result in (
+        invoice_tools.process_all_invoices(include_raw=True),
+        invoice_tools.search_invoices("invoice", include_raw=True),
+        invoice_tools.export_invoices_as_json(include_raw=True)["data"],
+    ):
+        assert result["invoices"]
+        assert all(invoice["raw_text"] for invoice in result["invoices"])
+
+    invoices = invoice_tools.process_all_invoices()["invoices"]
+    assert all("raw_text" not in invoice for invoice in invoices)
+
+
 def test_extracted_fields():
     """Test that key fields are extracted correctly."""
     import sys
@@ -127,5 +160,213 @@ def test_extracted_fields():
         assert 0 <= invoice.confidence_score <= 1  # Confidence should be 0-1
 
 
+def test_pattern_priority_over_position():
+    """Test that earlier patterns win even when a later one matches first."""
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    from pdf_processor import PatternExtractor
+
+    text = "INVOICE\nInvoice Address\nACME Inc\nINVOICE NUMBER 347003\n"
+    value, confidence = PatternExtractor.extract_field(text, "invoice_number")
+
+    assert value == "347003"
+    assert confidence == 1.0
+
+
+def test_directory_cache_invalidated_on_change(tmp_path, monkeypatch):
+    """Test that cached directory results track file modifications."""
+    import os
+    import shutil
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    from pdf_processor import PDFContentReader, process_invoices_in_directory
+
+    calls = []
+    extract_text = PDFContentReader.extract_text
+
+    def counting_extract_text(pdf_path):
+        calls.append(pdf_path)
+        return extract_text(pdf_path)
+
+    monkeypatch.setattr(
+        PDFContentReader, "extract_text", staticmethod(counting_extract_text)
+    )
+
+    source = next(Path("invoices").glob("*.pdf"))
+    target = tmp_path / source.name
+    shutil.copy(source, target)
+
+    first = process_invoices_in_directory(str(tmp_path))
+    assert process_invoices_in_directory(str(tmp_path)) == first
+    assert len(calls) == 1
+
+    stat = target.stat()
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert process_invoices_in_directory(str(tmp_path)) == first
+    assert len(calls) == 2
+
+    shutil.copy(source, tmp_path / f"copy-{source.name}")
+    assert process_invoices_in_directory(str(tmp_path))["total_processed"] == 2
+    assert len(calls) == 3
+
+
+def test_directory_results_are_not_shared(tmp_path):
+    """Test that mutating a returned result does not affect later calls."""
+    import shutil
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    from pdf_processor import (
+        process_invoices_in_directory,
+        search_invoices_in_directory,
+    )
+
+    source = next(Path("invoices").glob("*.pdf"))
+    shutil.copy(source, tmp_path / source.name)
+
+    first = process_invoices_in_directory(str(tmp_path))
+    expected = process_invoices_in_directory(str(tmp_path))
+    first["invoices"][0]["total_amount"] = -1
+    first["invoices"].clear()
+    first["summary"]["total_amount"] = -1
+    search_invoices_in_directory(str(tmp_path), "pdf")[0]["file_name"] = "changed"
+
+    assert process_invoices_in_directory(str(tmp_path)) == expected
+    assert search_invoices_in_directory(str(tmp_path), "pdf") == expected["invoices"]
+
+
+def test_failed_extraction_not_cached(tmp_path, monkeypatch):
+    """Test that a failed extraction is retried instead of being cached."""
+    import shutil
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    from pdf_processor import PDFContentReader, process_invoices_in_directory
+
+    source = next(Path("invoices").glob("*.pdf"))
+    shutil.copy(source, tmp_path / source.name)
+
+    def fail(self, pdf_path):
+        raise OSError("transient read error")
+
+    monkeypatch.setattr(PDFContentReader, "extract_text", fail)
+    failed = process_invoices_in_directory(str(tmp_path))
+    assert not failed["invoices"][0]["invoice_number"]
+
+    monkeypatch.undo()
+    retried = process_invoices_in_directory(str(tmp_path))
+    assert retried["invoices"][0]["invoice_number"]
+    assert process_invoices_in_directory(str(tmp_path)) == retried
+
+
+def test_search_extracts_each_file_once(tmp_path, monkeypatch):
+    """Test that a search extracts each uncached file only once."""
+    import shutil
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    from pdf_processor import PDFContentReader, search_invoices_in_directory
+
+    source = next(Path("invoices").glob("*.pdf"))
+    shutil.copy(source, tmp_path / source.name)
+
+    calls = []
+
+    def fail(pdf_path):
+        calls.append(pdf_path)
+        raise OSError("transient read error")
+
+    # Failed files are never cached, so every search has to extract them
+    monkeypatch.setattr(PDFContentReader, "extract_text", staticmethod(fail))
+    assert len(search_invoices_in_directory(str(tmp_path), "pdf")) == 1
+    assert len(search_invoices_in_directory(str(tmp_path), "pdf", True)) == 1
+    assert len(calls) == 2
+
+
+def test_textless_pdf_is_cached(tmp_path, monkeypatch):
+    """Test that a PDF without text (e.g. a scan) is cached, not re-extracted."""
+    import sys
+
+    from PyPDF2 import PdfWriter
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    from pdf_processor import PDFContentReader, process_invoices_in_directory
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=612, height=792)
+    with open(tmp_path / "scan.pdf", "wb") as f:
+        writer.write(f)
+
+    calls = []
+    extract_text = PDFContentReader.extract_text
+
+    def counting_extract_text(pdf_path):
+        calls.append(pdf_path)
+        return extract_text(pdf_path)
+
+    monkeypatch.setattr(
+        PDFContentReader, "extract_text", staticmethod(counting_extract_text)
+    )
+    for _ in range(3):
+        result = process_invoices_in_directory(str(tmp_path))
+        assert result["total_processed"] == 1
+
+    assert len(calls) == 1
+
+
+def test_pool_results_not_extracted_twice(tmp_path, monkeypatch):
+    """Test that uncached results from the pool are not extracted again."""
+    import shutil
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    import pdf_processor
+
+    source = next(Path("invoices").glob("*.pdf"))
+    for index in range(pdf_processor.PARALLEL_MIN_FILES):
+        shutil.copy(source, tmp_path / f"{index}-{source.name}")
+
+    calls = []
+
+    def fail(pdf_path):
+        calls.append(pdf_path)
+        raise OSError("transient read error")
+
+    # Run the "pool" in threads so the calls can be counted in this process
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(pdf_processor, "_get_pool", lambda: pool)
+    monkeypatch.setattr(
+        pdf_processor.PDFContentReader, "extract_text", staticmethod(fail)
+    )
+    result = pdf_processor.process_invoices_in_directory(str(tmp_path))
+    pool.shutdown()
+
+    assert result["total_processed"] == pdf_processor.PARALLEL_MIN_FILES
+    assert len(calls) == pdf_processor.PARALLEL_MIN_FILES
+
+
+def test_scan_skips_deleted_files(tmp_path, monkeypatch):
+    """Test that a file deleted between listing and stat is skipped."""
+    import shutil
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+    import pdf_processor
+
+    sources = sorted(Path("invoices").glob("*.pdf"))[:2]
+    for source in sources:
+        shutil.copy(source, tmp_path / source.name)
+
+    entries = pdf_processor.list_pdf_entries(str(tmp_path))
+    (tmp_path / sources[0].name).unlink()
+    monkeypatch.setattr(pdf_processor, "list_pdf_entries", lambda directory: entries)
+
+    signatures = pdf_processor._scan_pdf_signatures(str(tmp_path))
+    assert [Path(path).name for path, _, _ in signatures] == [sources[1].name]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])